@@ -9,9 +9,10 @@ from datetime import datetime
 import streamlit as st
 from PIL import Image
 
-from google import genai
 from google.genai import types
 
+from nano_banana_backend import ModelBackend, get_backend, backend_requires_api_key
+
 st.markdown("""
 <style>
 .stAppDeployButton { display: none !important; }
@@ -52,6 +53,10 @@ with col1:
 with col2:
     show_cost_info = st.checkbox("Mostrar info de costos", value=True)
 
+@st.cache_resource
+def get_model_backend(api_key: str) -> ModelBackend:
+    return get_backend(api_key)
+
 def estimate_cost(num_images, cost_per_image=0.039):
     return num_images * cost_per_image
 
@@ -81,18 +86,28 @@ def build_flat_payload(prompt_text, image_files):
 
 if gen_button:
     api_key = api_key_input.strip()
-    if not api_key:
+    try:
+        requires_api_key = backend_requires_api_key()
+    except Exception as e:
+        st.error(f"Error configurando el backend del modelo: {e}")
+        st.stop()
+
+    if not api_key and requires_api_key:
         st.error("Configura GEMINI_API_KEY en la barra lateral.")
         st.stop()
 
-    if set_env:
+    if set_env and api_key:
         os.environ["GEMINI_API_KEY"] = api_key
 
     if not prompt.strip():
         st.error("Ingresa un prompt.")
         st.stop()
 
-    client = genai.Client(api_key=api_key)
+    try:
+        backend = get_model_backend(api_key)
+    except Exception as e:
+        st.error(f"Error configurando el backend del modelo: {e}")
+        st.stop()
 
     # Opción A: payload “plano” cuando hay imágenes; string cuando no
     if ref_images:
@@ -110,7 +125,7 @@ if gen_button:
 
     with st.spinner("Generando..."):
         try:
-            response = client.models.generate_content(
+            response = backend.generate_content(
                 model="gemini-2.5-flash-image-preview",
                 contents=payload,
                 config=config,
@@ -13,9 +13,10 @@ from typing import List, Dict, Any
 import streamlit as st
 from PIL import Image
 
-from google import genai
 from google.genai import types
 
+from nano_banana_backend import ModelBackend, get_backend, backend_requires_api_key
+
 # ==================== PAGE CONFIGURATION ====================
 st.set_page_config(
     page_title="DBV Nano Banana Chat", 
@@ -84,9 +85,9 @@ st.markdown("""
 
 # ==================== UTILITY FUNCTIONS ====================
 @st.cache_resource
-def get_gemini_client(api_key: str) -> genai.Client:
-    """Initialize and cache Gemini client"""
-    return genai.Client(api_key=api_key)
+def get_model_backend(api_key: str) -> ModelBackend:
+    """Initialize and cache the model backend (Gemini, stub or record/replay)"""
+    return get_backend(api_key)
 
 def initialize_session_state():
     """Initialize all session state variables"""
@@ -327,19 +328,25 @@ def main():
     if prompt := st.chat_input("✨ What would you like to generate?"):
         # Validate API key
         api_key = api_key_input.strip()
-        if not api_key:
+        try:
+            requires_api_key = backend_requires_api_key()
+        except Exception as e:
+            st.error(f"❌ Failed to initialize model backend: {e}")
+            st.stop()
+        
+        if not api_key and requires_api_key:
             st.error("🔑 Please configure your GEMINI_API_KEY in the sidebar.")
             st.stop()
         
         # Set environment variable if requested
-        if set_env:
+        if set_env and api_key:
             os.environ["GEMINI_API_KEY"] = api_key
         
-        # Get cached client
+        # Get cached backend
         try:
-            client = get_gemini_client(api_key)
+            backend = get_model_backend(api_key)
         except Exception as e:
-            st.error(f"❌ Failed to initialize Gemini client: {e}")
+            st.error(f"❌ Failed to initialize model backend: {e}")
             st.stop()
         
         # Enhance prompt with style preferences
@@ -423,7 +430,7 @@ def main():
         # Generate content with enhanced error handling
         with st.spinner("🎨 Generating your masterpiece..."):
             try:
-                response = client.models.generate_content(
+                response = backend.generate_content(
                     model="gemini-2.5-flash-image-preview",
                     contents=contents,
                     config=config,
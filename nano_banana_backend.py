@@ -0,0 +1,270 @@
+# Pluggable model backends for the DBV Nano Banana apps
+# Both Streamlit apps call get_backend(...) instead of genai.Client directly,
+# so the generate -> parse -> save -> render path can run offline.
+#
+# Select the backend with environment variables:
+#   NANO_BANANA_BACKEND        gemini (default) | stub | record | replay
+#   NANO_BANANA_CASSETTE_DIR   cassette folder for record/replay (default: cassettes)
+#   NANO_BANANA_STUB_LATENCY   stub delay per call in seconds (default: 0)
+#   NANO_BANANA_STUB_JITTER    extra random delay in seconds, 0..jitter (default: 0)
+#   NANO_BANANA_STUB_ERROR_RATE  fraction of stub calls that fail, 0..1 (default: 0)
+#   NANO_BANANA_STUB_IMAGE_SIZE  side in pixels of the stub images (default: 1024)
+#   NANO_BANANA_STUB_SEED      seed for stub latency/error draws (default: 0)
+
+import os
+import io
+import json
+import time
+import random
+import hashlib
+import zlib
+import struct
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from PIL import Image
+
+from google import genai
+from google.genai import types
+
+BACKEND_ENV = "NANO_BANANA_BACKEND"
+BACKEND_NAMES = ("gemini", "stub", "record", "replay")
+API_KEY_BACKENDS = ("gemini", "record")
+
+STUB_ERRORS = (
+    "429 RESOURCE_EXHAUSTED: quota limit exceeded (stub)",
+    "503 UNAVAILABLE: the model is overloaded (stub)",
+    "400 INVALID_ARGUMENT: prompt blocked by safety filters (stub)",
+)
+
+
+class BackendError(RuntimeError):
+    """Raised by non-Gemini backends in place of an API error"""
+
+
+class CassetteMissError(BackendError):
+    """Raised in replay mode when no cassette matches a request"""
+
+
+# ==================== REQUEST HELPERS ====================
+def _to_jsonable(value: Any) -> Any:
+    """Convert contents/config (str, Part, Content, lists) into plain JSON data"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, bytes):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, Image.Image):
+        buf = io.BytesIO()
+        value.save(buf, format="PNG")
+        return {"image_png_sha256": hashlib.sha256(buf.getvalue()).hexdigest()}
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"Cannot build a request key from {type(value).__name__}")
+
+
+def request_key(model: str, contents: Any, config: Any = None) -> str:
+    """Stable hash identifying a generate_content request"""
+    payload = {
+        "model": model,
+        "contents": _to_jsonable(contents),
+        "config": _to_jsonable(config),
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _last_prompt_text(contents: Any) -> str:
+    """Return the last text part of a request, used by the stub to echo the prompt"""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, types.Part):
+        return contents.text or ""
+    if isinstance(contents, types.Content):
+        return _last_prompt_text(list(contents.parts or []))
+    if isinstance(contents, (list, tuple)):
+        for item in reversed(contents):
+            text = _last_prompt_text(item)
+            if text:
+                return text
+    return ""
+
+
+# ==================== BACKENDS ====================
+class ModelBackend(ABC):
+    """Interface shared by all backends: same call shape as client.models.generate_content"""
+
+    name = "base"
+
+    @abstractmethod
+    def generate_content(self, model: str, contents: Any,
+                         config: Optional[types.GenerateContentConfig] = None) -> types.GenerateContentResponse:
+        """Generate a response for `contents` with `model`"""
+
+
+class GeminiBackend(ModelBackend):
+    """Real Gemini API through google-genai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        self.client = genai.Client(api_key=api_key)
+
+    def generate_content(self, model, contents, config=None):
+        return self.client.models.generate_content(model=model, contents=contents, config=config)
+
+
+# One encoded noise PNG per image size (about 3 MB at 1024 px), built once and
+# reused: encoding noise takes ~0.3 s and would otherwise be billed to the app
+_NOISE_PNGS = {}
+_NOISE_LOCK = threading.Lock()
+
+
+def _noise_png(size: int) -> bytes:
+    """Noise PNG of the given size (incompressible, so sizes resemble real outputs)"""
+    with _NOISE_LOCK:
+        if size not in _NOISE_PNGS:
+            rng = random.Random(size)
+            pixels = rng.getrandbits(size * size * 24).to_bytes(size * size * 3, "little")
+            buf = io.BytesIO()
+            Image.frombytes("RGB", (size, size), pixels).save(buf, format="PNG")
+            _NOISE_PNGS[size] = buf.getvalue()
+        return _NOISE_PNGS[size]
+
+
+def _tagged_png(png: bytes, tag: str) -> bytes:
+    """Copy of a PNG with a tEXt chunk after IHDR, so every response has unique bytes"""
+    data = b"stub\x00" + tag.encode("ascii")
+    chunk = struct.pack(">I", len(data)) + b"tEXt" + data + struct.pack(">I", zlib.crc32(b"tEXt" + data))
+    ihdr_end = 8 + 25  # signature + IHDR chunk
+    return png[:ihdr_end] + chunk + png[ihdr_end:]
+
+
+class StubBackend(ModelBackend):
+    """Deterministic local stub returning synthetic images and text"""
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 image_size: int = 1024, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.image_size = image_size
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = 0
+        _noise_png(image_size)
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            self._calls += 1
+            call = self._calls
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            error = self._rng.choice(STUB_ERRORS) if fail else None
+        if delay > 0:
+            time.sleep(delay)
+        if error:
+            raise BackendError(error)
+
+        # Cheap digest (no full-history hashing): call number, turns and last prompt
+        prompt = _last_prompt_text(contents)
+        turns = len(contents) if isinstance(contents, (list, tuple)) else 1
+        digest = hashlib.sha256(f"{call}:{turns}:{prompt}".encode("utf-8")).hexdigest()
+        parts = [
+            types.Part(text=f"[stub {digest[:8]}] {prompt[:200]}"),
+            types.Part.from_bytes(data=_tagged_png(_noise_png(self.image_size), digest), mime_type="image/png"),
+        ]
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+        )
+
+
+class CassetteBackend(ModelBackend):
+    """Record/replay: stores real responses on disk, one JSON file per request key"""
+
+    def __init__(self, cassette_dir: str, inner: Optional[ModelBackend] = None):
+        self.cassette_dir = cassette_dir
+        self.inner = inner
+        self.name = "record" if inner is not None else "replay"
+        os.makedirs(cassette_dir, exist_ok=True)
+
+    def cassette_path(self, key: str) -> str:
+        return os.path.join(self.cassette_dir, f"{key}.json")
+
+    def generate_content(self, model, contents, config=None):
+        key = request_key(model, contents, config)
+        path = self.cassette_path(key)
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                cassette = json.load(f)
+            return types.GenerateContentResponse.model_validate(cassette["response"])
+
+        if self.inner is None:
+            raise CassetteMissError(f"No cassette for request {key[:12]} in {self.cassette_dir}")
+
+        response = self.inner.generate_content(model=model, contents=contents, config=config)
+        cassette = {
+            "key": key,
+            "model": model,
+            "prompt": _last_prompt_text(contents),
+            "response": response.model_dump(mode="json", exclude_none=True),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cassette, f)
+        os.replace(tmp_path, path)
+        return response
+
+
+# ==================== FACTORY ====================
+def backend_name() -> str:
+    """Backend selected through NANO_BANANA_BACKEND"""
+    name = os.environ.get(BACKEND_ENV, "gemini").strip().lower() or "gemini"
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Unknown {BACKEND_ENV}={name!r}; expected one of {', '.join(BACKEND_NAMES)}")
+    return name
+
+
+def backend_requires_api_key() -> bool:
+    """Whether the selected backend needs a GEMINI_API_KEY"""
+    return backend_name() in API_KEY_BACKENDS
+
+
+def _env_number(name: str, default: str, cast, minimum=None, maximum=None):
+    """Read a numeric setting, naming the variable if it is malformed or out of range"""
+    raw = os.environ.get(name, default)
+    try:
+        value = cast(raw)
+    except ValueError:
+        raise ValueError(f"{name}={raw!r} is not a valid {cast.__name__}") from None
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        bounds = f">= {minimum}" if maximum is None else f"between {minimum} and {maximum}"
+        raise ValueError(f"{name}={raw!r} must be {bounds}")
+    return value
+
+
+def get_backend(api_key: str = "") -> ModelBackend:
+    """Build the backend selected through environment variables"""
+    name = backend_name()
+    cassette_dir = os.environ.get("NANO_BANANA_CASSETTE_DIR", "cassettes")
+
+    if name == "stub":
+        return StubBackend(
+            latency=_env_number("NANO_BANANA_STUB_LATENCY", "0", float, minimum=0),
+            jitter=_env_number("NANO_BANANA_STUB_JITTER", "0", float, minimum=0),
+            error_rate=_env_number("NANO_BANANA_STUB_ERROR_RATE", "0", float, minimum=0, maximum=1),
+            image_size=_env_number("NANO_BANANA_STUB_IMAGE_SIZE", "1024", int, minimum=1),
+            seed=_env_number("NANO_BANANA_STUB_SEED", "0", int),
+        )
+    if name == "replay":
+        return CassetteBackend(cassette_dir)
+    if name == "record":
+        return CassetteBackend(cassette_dir, inner=GeminiBackend(api_key))
+    return GeminiBackend(api_key)
@@ -0,0 +1,478 @@
+# Multi-session load test for DBV_Nano_Banana_Streamlit_Chat.py
+# Drives N simulated users (one Streamlit AppTest session each, all in this
+# process, like sessions sharing one Streamlit server) through chat scripts
+# against the local stub backend, and reports per-turn latency percentiles,
+# RSS growth and throughput for every N. Each N runs in a fresh subprocess and
+# RSS growth is measured from a baseline taken after the warm-up run, so levels
+# do not inherit sessions or one-time costs from each other.
+#
+# Run: python nano_banana_loadtest.py --users 1,10,50,100,200 --turns 3 --latency 1.0
+# Run and compare with a previous report:
+#   python nano_banana_loadtest.py --users 1,10 --compare loadtest_reports/old.json
+# Compare two saved reports without running:
+#   python nano_banana_loadtest.py --compare loadtest_reports/old.json loadtest_reports/new.json
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+try:
+    import psutil
+except ImportError:  # optional, /proc is used as a fallback
+    psutil = None
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DBV_Nano_Banana_Streamlit_Chat.py")
+
+# share_streamlit_runtime() patches private Streamlit internals; only these
+# major.minor versions have been checked to behave like a single server
+TESTED_STREAMLIT_VERSIONS = ("1.66",)
+
+# ==================== CHAT SCRIPTS ====================
+CHAT_SCRIPTS = [
+    {
+        "style": "Photorealistic",
+        "prompts": [
+            "A fluffy shih tzu playing with a red ball on a sandy beach at golden hour",
+            "Make the ball blue and add a lighthouse in the background",
+            "Now show the same scene at night under a full moon",
+            "Zoom in on the dog's face",
+        ],
+    },
+    {
+        "style": "Cartoon",
+        "prompts": [
+            "A banana superhero flying over a city",
+            "Give the banana a green cape",
+            "Add a villain made of pineapple",
+            "Make it a comic book cover",
+        ],
+    },
+    {
+        "style": "Minimalist",
+        "prompts": [
+            "A logo for a coffee shop called Nano Bean",
+            "Use only two colors",
+            "Try a round version",
+            "Put it on a paper cup mockup",
+        ],
+    },
+    {
+        "style": "Default",
+        "prompts": [
+            "An isometric cozy library with plants",
+            "Add a cat sleeping on the sofa",
+            "Change the lighting to warm evening light",
+            "Render it as a watercolor",
+        ],
+    },
+]
+
+
+# ==================== MEASUREMENT HELPERS ====================
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile with linear interpolation (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class RssSampler:
+    """Samples RSS in a background thread to capture the peak during a level"""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+def git_version() -> str:
+    """Short description of the checked-out version, or 'unknown'"""
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(APP_PATH), stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ==================== SHARED STREAMLIT RUNTIME ====================
+def check_streamlit_version(allow_untested: bool) -> str:
+    """Return the Streamlit version, exiting if share_streamlit_runtime() was not tested on it"""
+    import streamlit
+
+    version = streamlit.__version__
+    if ".".join(version.split(".")[:2]) not in TESTED_STREAMLIT_VERSIONS and not allow_untested:
+        sys.exit(
+            f"Streamlit {version} has not been tested with this harness "
+            f"(tested: {', '.join(TESTED_STREAMLIT_VERSIONS)}). It patches Streamlit internals, "
+            "so results may be wrong; pass --allow-untested-streamlit to run anyway."
+        )
+    return version
+
+
+def share_streamlit_runtime():
+    """Make concurrent AppTest sessions behave like sessions of one server.
+
+    AppTest installs a new mock Runtime for every run and clears it afterwards,
+    so runs in parallel threads break each other, and it compiles the script on
+    every run. A warm-up run captures its Runtime, which is then returned to all
+    sessions, and every run shares one script cache, as in `streamlit run`.
+    AppTest also patches config.get_option around each run without locking, so
+    "global.appTest" is set once for the process instead.
+    """
+    import contextlib
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1 import app_test
+
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+    captured = []
+    original_instance = Runtime.instance.__func__
+
+    def capture_instance(cls):
+        runtime = original_instance(cls)
+        if not captured:
+            captured.append(runtime)
+        return runtime
+
+    Runtime.instance = classmethod(capture_instance)
+    AppTest.from_file(APP_PATH, default_timeout=60).run()
+    if not captured:
+        raise RuntimeError("Could not capture the Streamlit runtime during warm-up")
+
+    shared_runtime = captured[0]
+    Runtime.instance = classmethod(lambda cls: shared_runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    shared_cache = ScriptCache()
+    original_get_bytecode = ScriptCache.get_bytecode
+    ScriptCache.get_bytecode = lambda self, script_path: original_get_bytecode(shared_cache, script_path)
+
+
+# ==================== SIMULATED USER ====================
+def find_widget(widgets, label: str):
+    """Return the widget with the given label from an AppTest element list"""
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"Widget not found: {label}")
+
+
+def run_user(user_id: int, turns: int, output_dir: str, think_time: float,
+             timeout: float, seed: int) -> Dict[str, Any]:
+    """Drive one chat session through a script and time every turn"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + user_id)
+    script = CHAT_SCRIPTS[user_id % len(CHAT_SCRIPTS)]
+    result = {"user": user_id, "latencies": [], "errors": 0, "failures": []}
+
+    try:
+        # One folder per user: saved file names only have second resolution
+        user_dir = os.path.join(output_dir, f"user_{user_id}")
+        os.makedirs(user_dir, exist_ok=True)
+
+        at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        at.run()
+        find_widget(at.text_input, "Output Directory").set_value(user_dir)
+        find_widget(at.selectbox, "Style Preset").set_value(script["style"])
+        at.run()
+
+        for turn in range(turns):
+            prompt = script["prompts"][turn % len(script["prompts"])]
+            start = time.perf_counter()
+            at.chat_input[0].set_value(prompt).run()
+            result["latencies"].append(time.perf_counter() - start)
+
+            if at.exception or at.error:
+                result["errors"] += 1
+                messages = [e.value for e in at.exception] + [e.value for e in at.error]
+                result["failures"].append(str(messages[0])[:200])
+
+            if think_time > 0:
+                time.sleep(rng.uniform(0.5, 1.5) * think_time)
+    except Exception as e:
+        result["errors"] += 1
+        result["failures"].append(f"{type(e).__name__}: {e}"[:200])
+
+    return result
+
+
+# ==================== LOAD LEVELS ====================
+def run_level(users: int, args: argparse.Namespace, output_dir: str) -> Dict[str, Any]:
+    """Run `users` concurrent sessions and summarize the level (RSS relative to the current baseline)"""
+    gc.collect()
+    rss_start = current_rss_mb()
+    level_dir = os.path.join(output_dir, f"users_{users}")
+    os.makedirs(level_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [
+            pool.submit(run_user, u, args.turns, level_dir, args.think_time, args.timeout, args.seed)
+            for u in range(users)
+        ]
+        results = [f.result() for f in futures]
+    wall = time.perf_counter() - start
+    rss_end = current_rss_mb()
+
+    latencies = [lat for r in results for lat in r["latencies"]]
+    errors = sum(r["errors"] for r in results)
+    failures = sorted({msg for r in results for msg in r["failures"]})
+    return {
+        "users": users,
+        "turns": len(latencies),
+        "errors": errors,
+        "error_samples": failures[:5],
+        "wall_s": round(wall, 3),
+        "throughput_turns_per_s": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_s": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p90": round(percentile(latencies, 90), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+        "rss_mb": {
+            "start": round(rss_start, 1),
+            "peak": round(sampler.peak, 1),
+            "end": round(rss_end, 1),
+            "growth": round(rss_end - rss_start, 1),
+        },
+    }
+
+
+def run_level_process(args: argparse.Namespace):
+    """Body of a level subprocess: warm up, take the RSS baseline, run the level, write it as JSON"""
+    check_streamlit_version(args.allow_untested_streamlit)
+    configure_stub(args)
+    rss_before_warmup = current_rss_mb()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="nanobanana_loadtest_") as output_dir:
+        # The app creates its default outputs/ folder on the first run of each
+        # session, before the harness can redirect it, so run from the temp dir
+        os.chdir(output_dir)
+        try:
+            share_streamlit_runtime()
+            level = run_level(args.single_level, args, output_dir)
+        finally:
+            os.chdir(cwd)
+
+    level["rss_mb"]["before_warmup"] = round(rss_before_warmup, 1)
+    with open(args.level_output, "w") as f:
+        json.dump(level, f)
+
+
+def run_level_subprocess(users: int, args: argparse.Namespace, level_output: str) -> Dict[str, Any]:
+    """Run one level in a fresh Python process and return its summary"""
+    command = [
+        sys.executable, os.path.abspath(__file__),
+        "--single-level", str(users), "--level-output", level_output,
+        "--turns", str(args.turns), "--think-time", str(args.think_time),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--image-size", str(args.image_size),
+        "--seed", str(args.seed), "--timeout", str(args.timeout),
+    ]
+    if args.allow_untested_streamlit:
+        command.append("--allow-untested-streamlit")
+
+    completed = subprocess.run(command)
+    if completed.returncode != 0 or not os.path.exists(level_output):
+        sys.exit(f"Level with {users} user(s) failed (exit code {completed.returncode})")
+    with open(level_output) as f:
+        return json.load(f)
+
+
+def configure_stub(args: argparse.Namespace):
+    """Point the chat app at the local stub backend through its environment variables"""
+    os.environ["NANO_BANANA_BACKEND"] = "stub"
+    os.environ["NANO_BANANA_STUB_LATENCY"] = str(args.latency)
+    os.environ["NANO_BANANA_STUB_JITTER"] = str(args.jitter)
+    os.environ["NANO_BANANA_STUB_ERROR_RATE"] = str(args.error_rate)
+    os.environ["NANO_BANANA_STUB_IMAGE_SIZE"] = str(args.image_size)
+    os.environ["NANO_BANANA_STUB_SEED"] = str(args.seed)
+
+
+# ==================== REPORTING ====================
+def print_levels(levels: List[Dict[str, Any]]):
+    """Print one line per load level"""
+    header = f"{'users':>6} {'turns':>6} {'errors':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'turns/s':>8} {'RSS peak':>9} {'RSS +':>7}"
+    print(header)
+    print("-" * len(header))
+    for lvl in levels:
+        lat, rss = lvl["latency_s"], lvl["rss_mb"]
+        print(f"{lvl['users']:>6} {lvl['turns']:>6} {lvl['errors']:>6} {lat['p50']:>8.3f} {lat['p95']:>8.3f} "
+              f"{lat['p99']:>8.3f} {lvl['throughput_turns_per_s']:>8.2f} {rss['peak']:>9.1f} {rss['growth']:>7.1f}")
+
+
+def print_comparison(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print p95 latency, throughput and RSS peak deltas against a previous report"""
+    base_levels = {lvl["users"]: lvl for lvl in baseline["levels"]}
+    print(f"\nComparison: {baseline.get('version', '?')} -> {current.get('version', '?')}")
+    old_streamlit = baseline.get("settings", {}).get("streamlit", "?")
+    new_streamlit = current.get("settings", {}).get("streamlit", "?")
+    if old_streamlit != new_streamlit:
+        print(f"WARNING: Streamlit version differs ({old_streamlit} -> {new_streamlit})")
+    print(f"{'users':>6} {'p95 s':>18} {'turns/s':>18} {'RSS peak MB':>20}")
+    for lvl in current["levels"]:
+        old = base_levels.get(lvl["users"])
+        if old is None:
+            continue
+        print(f"{lvl['users']:>6} "
+              f"{old['latency_s']['p95']:>8.3f} -> {lvl['latency_s']['p95']:<6.3f} "
+              f"{old['throughput_turns_per_s']:>8.2f} -> {lvl['throughput_turns_per_s']:<6.2f} "
+              f"{old['rss_mb']['peak']:>9.1f} -> {lvl['rss_mb']['peak']:<7.1f}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test for the DBV Nano Banana chat app")
+    parser.add_argument("--users", default="1,10,50,100,200",
+                        help="Comma-separated numbers of concurrent users (default: 1,10,50,100,200)")
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per user (default: 3)")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Mean pause between a user's turns in seconds (default: 0)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub latency per call in seconds (default: 1.0)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Extra random stub latency in seconds (default: 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failing stub calls (default: 0)")
+    parser.add_argument("--image-size", type=int, default=1024, help="Stub image side in pixels (default: 1024)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for stub draws and think times (default: 0)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Timeout per app run in seconds (default: 300)")
+    parser.add_argument("--label", default="", help="Free-form label stored in the report")
+    parser.add_argument("--report-dir", default="loadtest_reports", help="Folder for JSON reports")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT",
+                        help="One report: run, then compare against it. "
+                             "Two reports: compare them without running")
+    parser.add_argument("--allow-untested-streamlit", action="store_true",
+                        help="Run even if the installed Streamlit version has not been tested")
+    # Internal: used by the parent process to run one level per subprocess
+    parser.add_argument("--single-level", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--level-output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes one or two report paths")
+    try:
+        args.user_levels = [int(n) for n in args.users.split(",") if n.strip()]
+    except ValueError:
+        parser.error(f"--users must be comma-separated integers, got {args.users!r}")
+    if not args.user_levels or any(n < 1 for n in args.user_levels):
+        parser.error("--users values must be at least 1")
+    if args.turns < 1:
+        parser.error("--turns must be at least 1")
+    if args.image_size < 1:
+        parser.error("--image-size must be at least 1")
+    return args
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.compare and len(args.compare) == 2:
+        print_comparison(load_report(args.compare[1]), load_report(args.compare[0]))
+        return
+
+    if args.single_level is not None:
+        run_level_process(args)
+        return
+
+    streamlit_version = check_streamlit_version(args.allow_untested_streamlit)
+    report_dir = os.path.abspath(args.report_dir)
+
+    levels = []
+    with tempfile.TemporaryDirectory(prefix="nanobanana_loadtest_levels_") as levels_dir:
+        for users in args.user_levels:
+            print(f"Running {users} user(s) x {args.turns} turn(s)...", flush=True)
+            level_output = os.path.join(levels_dir, f"users_{users}.json")
+            levels.append(run_level_subprocess(users, args, level_output))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "label": args.label,
+        "version": git_version(),
+        "app": os.path.basename(APP_PATH),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "turns": args.turns,
+            "think_time": args.think_time,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "image_size": args.image_size,
+            "seed": args.seed,
+            "streamlit": streamlit_version,
+            "images": "unique per user and turn (the stub tags every response)",
+            "rss_baseline": "per level, fresh process, measured after the warm-up run",
+        },
+        "levels": levels,
+    }
+
+    print()
+    print_levels(levels)
+
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+    if args.compare:
+        print_comparison(report, load_report(args.compare[0]))
+
+
+# ==================== ENTRY POINT ====================
+if __name__ == "__main__":
+    main()